@@ -3,10 +3,14 @@ import pandas as pd
 import google.generativeai as genai
 import json
 import re
-from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableLambda
 import os
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from typing import NamedTuple
+import duckdb
+from datetime import timedelta
 
 # Set up page configuration for a better UI
 st.set_page_config(page_title="Dumroo Admin Panel", layout="wide", initial_sidebar_state="expanded")
@@ -16,17 +20,10 @@ gemini_api_key = st.secrets.get("GEMINI_API_KEY")
 if not gemini_api_key:
     st.error("Gemini API key not found. Please configure it in secrets.toml or environment variables.")
     st.stop()
-os.environ["GEMINI_API_KEY"] = gemini_api_key
-genai.configure(api_key=gemini_api_key)
 
-# Custom CSS for styling
-st.markdown("""
+# Custom CSS for component styling; app colours and font come from the theme in .streamlit/config.toml
+CUSTOM_CSS = """
     <style>
-    .stApp {
-        background-color: #f0f2f6;
-        color: #333333;
-        font-family: 'Arial', sans-serif;
-    }
     .sidebar .sidebar-content {
         background-color: #ffffff;
         padding: 20px;
@@ -78,53 +75,90 @@ st.markdown("""
         margin-bottom: 10px;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# Sample dataset, stored as a typed Feather file next to this module.
+# cache_resource hands out the same read-only frames instead of copying them on every call.
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "students.feather")
 
-# Sample dataset with more data
-@st.cache_data
+@st.cache_resource(show_spinner=False)
 def load_data():
-    data = {
-        "student_name": ["Alice Smith", "Bob Johnson", "Charlie Brown", "Diana Wilson", 
-                        "Eve Davis", "Frank Miller", "Grace Lee", "Hank Taylor"],
-        "grade": [8, 8, 9, 9, 8, 9, 8, 9],
-        "class": ["A", "A", "B", "B", "A", "B", "A", "B"],
-        "region": ["North", "North", "South", "South", "North", "South", "North", "South"],
-        "homework_submitted": [True, False, True, False, False, True, True, False],
-        "quiz_score": [85, 0, 90, 0, 75, 88, 92, 0],
-        "quiz_date": ["2025-07-10", "2025-07-10", "2025-07-17", "2025-07-17", 
-                      "2025-07-15", "2025-07-16", "2025-07-12", "2025-07-14"],
-        "upcoming_quiz": ["2025-07-20", "2025-07-20", "2025-07-21", "2025-07-21", 
-                         "2025-07-22", "2025-07-23", "2025-07-24", "2025-07-25"],
-    }
-    df = pd.DataFrame(data)
-    df["quiz_date"] = pd.to_datetime(df["quiz_date"])
-    df["upcoming_quiz"] = pd.to_datetime(df["upcoming_quiz"])
-    return df
+    df = pd.read_feather(DATA_PATH, dtype_backend="pyarrow")
+    # Date columns go back to numpy datetime64: searchsorted on an Arrow column converts the
+    # whole column on every call, which defeats the binary search in slice_dates
+    for column in ("quiz_date", "upcoming_quiz"):
+        df[column] = df[column].astype("datetime64[ns]")
+    # Categorical scope columns compare as small integer codes instead of Python strings
+    df["class"] = df["class"].astype(pd.CategoricalDtype(["A", "B"]))
+    df["region"] = df["region"].astype(pd.CategoricalDtype(["North", "South"]))
+    # Index by scope once so each query selects its rows with a single lookup
+    df_idx = df.set_index(["grade", "class", "region"]).sort_index()
+    # Students with missing homework, precomputed so homework queries skip the comparison
+    df_missing = df[~df["homework_submitted"]].set_index(["grade", "class", "region"]).sort_index()
+    return df, df_idx, df_missing
+
+# Rows for one (grade, class, region) key; empty when the scope has no rows
+def select_scope(df_idx, scope_key):
+    try:
+        return df_idx.loc[[scope_key]]
+    except KeyError:
+        return df_idx.iloc[0:0]
 
 # Role-based access control
+class Scope(NamedTuple):
+    grade: int
+    class_: str
+    region: str
+
 admin_scopes = {
-    "grade_8_admin": {"grade": 8, "class": "A", "region": "North"},
-    "grade_9_admin": {"grade": 9, "class": "B", "region": "South"},
+    "grade_8_admin": Scope(8, "A", "North"),
+    "grade_9_admin": Scope(9, "B", "South"),
 }
 
-def check_access(admin_role, query_grade, query_class, query_region):
+ACCESS_DENIED_MESSAGE = "Access denied: You don't have permission to view this data."
+
+# Returns the (grade, class, region) the query resolves to, or None if access is denied
+def resolve_scope(admin_role, query_grade, query_class, query_region):
     scope = admin_scopes.get(admin_role)
     if not scope:
-        return False
-    effective_grade = int(query_grade) if query_grade is not None and query_grade.isdigit() else scope["grade"]
-    effective_class = query_class if query_class is not None else scope["class"]
-    effective_region = query_region if query_region is not None else scope["region"]
-    return (
-        effective_grade == scope["grade"]
-        and effective_class == scope["class"]
-        and effective_region == scope["region"]
+        return None
+    effective_key = (
+        int(query_grade) if query_grade is not None and str(query_grade).isdigit() else scope.grade,
+        str(query_class).upper() if query_class is not None else scope.class_,
+        str(query_region).capitalize() if query_region is not None else scope.region,
     )
+    return tuple(scope) if effective_key == scope else None
+
+# Each role sees exactly one scope, so its rows are precomputed: the ready-to-return names of
+# students with missing homework, and the scoped rows sorted by each date column for range slicing
+@st.cache_resource(show_spinner=False)
+def load_role_frames():
+    _, df_idx, df_missing = load_data()
+    # slice_dates relies on searchsorted over a numpy array; any other dtype (e.g. Arrow-backed)
+    # would silently turn each slice into a full-column conversion
+    for column in ("quiz_date", "upcoming_quiz"):
+        assert pd.api.types.is_datetime64_dtype(df_idx[column]), (
+            f"{column} must be numpy datetime64 for binary-search slicing, got {df_idx[column].dtype}"
+        )
+    role_frames = {}
+    for role, scope in admin_scopes.items():
+        scope_key = tuple(scope)
+        role_df = select_scope(df_idx, scope_key)
+        role_frames[role] = {
+            "missing": select_scope(df_missing, scope_key)[["student_name"]],
+            "quiz_date": role_df.sort_values("quiz_date"),
+            "upcoming_quiz": role_df.sort_values("upcoming_quiz"),
+        }
+    return role_frames
+
+# Rows whose date column falls in [start, end]; the frame must be sorted by that column
+def slice_dates(sorted_df, column, start, end):
+    dates = sorted_df[column]
+    return sorted_df.iloc[dates.searchsorted(start, side="left"):dates.searchsorted(end, side="right")]
 
-# LangChain setup with Gemini
-model = genai.GenerativeModel("gemini-2.0-flash")
-prompt = PromptTemplate(
-    input_variables=["query"],
-    template="""
+# Prompt templates for Gemini
+query_template = """
     You are an AI assistant for an admin panel. Parse the following natural language query and extract:
     1. The type of data requested (e.g., homework, performance, quizzes)
     2. The grade (if mentioned, e.g., 8 or 9)
@@ -135,77 +169,283 @@ prompt = PromptTemplate(
     Return ONLY a valid JSON object with keys: "data_type", "grade", "class", "region", "time_period". Ensure the output contains no additional text or comments.
     
     Query: {query}
-    """,
-)
+    """
+
+# Same extraction for several queries at once, used by batch mode and history replay
+batch_template = """
+    You are an AI assistant for an admin panel. Parse each of the following numbered natural language queries and extract:
+    1. The type of data requested (e.g., homework, performance, quizzes)
+    2. The grade (if mentioned, e.g., 8 or 9)
+    3. The class (if mentioned, e.g., A or B)
+    4. The region (if mentioned, e.g., North or South)
+    5. The time period (if mentioned, e.g., last week, next week)
+    
+    Return ONLY a valid JSON array with one object per query, in the same order, each with keys: "data_type", "grade", "class", "region", "time_period". Ensure the output contains no additional text or comments.
+    
+    Queries:
+    {queries}
+    """
+
+# Maximum number of queries packed into a single batched Gemini call
+BATCH_SIZE = 10
+
+# Force JSON output so responses can be parsed without any cleanup; temperature 0 keeps
+# parses deterministic, which also makes cached parses safe to reuse
+generation_config = {"response_mime_type": "application/json", "temperature": 0}
+
+# Schema for one parsed query, so Gemini returns exactly these fields
+query_schema = {
+    "type": "object",
+    "properties": {
+        "data_type": {"type": "string", "enum": ["homework", "performance", "quizzes"], "nullable": True},
+        "grade": {"type": "integer", "nullable": True},
+        "class": {"type": "string", "nullable": True},
+        "region": {"type": "string", "nullable": True},
+        "time_period": {"type": "string", "enum": ["last week", "next week"], "nullable": True},
+    },
+    "required": ["data_type", "grade", "class", "region", "time_period"],
+}
+batch_schema = {"type": "array", "items": query_schema}
+
+# Configure the client and build the Gemini model once per API key instead of on every rerun
+@st.cache_resource(show_spinner=False)
+def get_model(api_key):
+    os.environ["GEMINI_API_KEY"] = api_key
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel("gemini-2.0-flash", generation_config=generation_config)
+
+# Send a formatted prompt straight to Gemini and return the response text
+def generate_gemini_response(prompt_text, response_schema):
+    # Stream the response so decoding overlaps with receiving it
+    response = get_model(gemini_api_key).generate_content(
+        prompt_text, generation_config={"response_schema": response_schema}, stream=True
+    )
+    return "".join(chunk.text for chunk in response)
+
+# Keyword patterns for resolving common queries without calling the LLM
+_RE_HW = re.compile(r"homework|submit", re.I)
+_RE_PERF = re.compile(r"performance|score|quiz\s+result", re.I)
+_RE_QUIZ = re.compile(r"upcoming|schedul|next\s+week", re.I)
+_RE_GRADE = re.compile(r"\bgrade\s*(\d+)\b", re.I)
+# Class letters are matched case-sensitively and skip "I", so the pronoun and the article "a"
+# ("the class I teach", "a class a day") are never read as a class name
+_RE_CLASS = re.compile(r"\b(?i:class)\s*([A-HJ-Z])\b")
+_RE_REGION = re.compile(r"\b(north|south|east|west)\b", re.I)
+# Scope words: a query that uses one without a value the patterns above capture ("grade nine",
+# "southern region") names a scope the fast path cannot read, so it is left to Gemini
+_RE_GRADE_WORD = re.compile(r"\bgrade", re.I)
+_RE_CLASS_WORD = re.compile(r"\bclass", re.I)
+_RE_REGION_WORD = re.compile(r"\b(region|north|south|east|west)", re.I)
+_RE_LAST_WEEK = re.compile(r"\blast\s+week\b", re.I)
+_RE_NEXT_WEEK = re.compile(r"\bnext\s+week\b", re.I)
+_RE_TRAILING_PUNCT = re.compile(r"[\s.?!]+$")
+
+# Grade, class and region mentioned in the query; None for any that are not mentioned
+def extract_scope_locally(query):
+    grade = _RE_GRADE.search(query)
+    query_class = _RE_CLASS.search(query)
+    region = _RE_REGION.search(query)
+    return (
+        grade.group(1) if grade else None,
+        query_class.group(1).upper() if query_class else None,
+        region.group(1).capitalize() if region else None,
+    )
+
+# Fast path: returns the same dict shape as parse_query, or None when ambiguous
+def try_parse_locally(query):
+    data_types = [
+        data_type
+        for data_type, pattern in (("homework", _RE_HW), ("performance", _RE_PERF), ("quizzes", _RE_QUIZ))
+        if pattern.search(query)
+    ]
+    if len(data_types) != 1:
+        return None
+    data_type = data_types[0]
+
+    time_period = None
+    if _RE_LAST_WEEK.search(query):
+        time_period = "last week"
+    elif _RE_NEXT_WEEK.search(query):
+        time_period = "next week"
+    if data_type == "performance" and time_period != "last week":
+        return None
+    if data_type == "quizzes" and time_period != "next week":
+        return None
+
+    query_grade, query_class, query_region = extract_scope_locally(query)
+    for value, word in ((query_grade, _RE_GRADE_WORD), (query_class, _RE_CLASS_WORD), (query_region, _RE_REGION_WORD)):
+        if value is None and word.search(query):
+            return None
+    return {
+        "data_type": data_type,
+        "grade": query_grade,
+        "class": query_class,
+        "region": query_region,
+        "time_period": time_period,
+    }
+
+# Cache key for parse_query, so "Show homework." and "show  homework" share one LLM call
+def normalize_query(query):
+    return _RE_TRAILING_PUNCT.sub("", " ".join(query.split()).lower())
+
+_json_decoder = json.JSONDecoder()
+
+# Decode the first JSON object or array in an LLM response, ignoring any text around it
+def decode_json(text):
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise json.JSONDecodeError("No JSON value found", text, 0)
+    return _json_decoder.raw_decode(text, min(starts))[0]
+
+# Parsed queries keyed by normalize_query and shared by single and batched parses, so a query
+# parsed either way is never sent to Gemini again while its entry is fresh
+PARSE_CACHE_TTL = 3600
+PARSE_CACHE_SIZE = 256
+
+@st.cache_resource(show_spinner=False)
+def get_parse_cache():
+    return OrderedDict(), threading.Lock()
+
+# Cached parse for a normalized query, or None when missing or expired
+def cached_parse(key):
+    cache, lock = get_parse_cache()
+    with lock:
+        entry = cache.get(key)
+    if entry is None or time.monotonic() - entry[0] > PARSE_CACHE_TTL:
+        return None
+    return entry[1]
+
+def store_parse(key, parsed_data):
+    cache, lock = get_parse_cache()
+    with lock:
+        cache[key] = (time.monotonic(), parsed_data)
+        cache.move_to_end(key)
+        while len(cache) > PARSE_CACHE_SIZE:
+            cache.popitem(last=False)
 
-# Create a RunnableLambda to handle Gemini response
-def generate_gemini_response(prompt_value):
-    query_text = prompt_value.text if hasattr(prompt_value, "text") else str(prompt_value)
-    response = model.generate_content(query_text)
-    return response.text
+# Parse a normalized query into a plain dict; identical queries reuse the cached result
+def parse_query(query):
+    parsed_data = cached_parse(query)
+    if parsed_data is None:
+        parsed_data = decode_json(generate_gemini_response(query_template.format(query=query), query_schema))
+        if isinstance(parsed_data, dict):
+            store_parse(query, parsed_data)
+    return parsed_data
 
-chain = prompt | RunnableLambda(generate_gemini_response)
+# Shared worker pool so Gemini calls do not block the Streamlit script thread
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=4)
 
-# Process query and fetch data with fallback
-def process_query(query, admin_role):
+# True when the query explicitly names a scope outside the admin's, so no Gemini call is needed
+def denied_locally(query, admin_role):
+    return resolve_scope(admin_role, *extract_scope_locally(query)) is None
+
+# Parse one batch of normalized queries with a single Gemini call; each parse is cached under
+# its query so later single submits and replays reuse it
+def parse_batch(queries):
+    numbered = "\n".join(f"{n}. {query}" for n, query in enumerate(queries, 1))
+    items = decode_json(generate_gemini_response(batch_template.format(queries=numbered), batch_schema))
+    if not isinstance(items, list):
+        return []
+    for query, item in zip(queries, items):
+        if isinstance(item, dict):
+            store_parse(query, item)
+    return items
+
+# Bonus: Modular database connection (in-memory DuckDB seeded from the sample dataset)
+@st.cache_resource(show_spinner=False)
+def connect_to_db():
+    con = duckdb.connect(":memory:")
+    con.register("students_df", load_data()[0])
+    con.execute("CREATE TABLE students AS SELECT * FROM students_df")
+    con.unregister("students_df")
+    return con
+
+# SQL equivalents of the pandas filters, so the database does the filtering
+_SCOPE_SQL = 'grade = ? AND "class" = ? AND region = ?'
+DB_QUERIES = {
+    "homework": f"SELECT student_name FROM students WHERE {_SCOPE_SQL} AND NOT homework_submitted",
+    "performance": f"SELECT student_name, quiz_score FROM students WHERE {_SCOPE_SQL} AND quiz_date BETWEEN ? AND ?",
+    "quizzes": f"SELECT student_name, upcoming_quiz FROM students WHERE {_SCOPE_SQL} AND upcoming_quiz BETWEEN ? AND ?",
+}
+
+# DuckDB connections are not thread-safe, so each call uses a short-lived cursor that is closed after use
+def query_db(data_type, scope_key, *params):
+    with connect_to_db().cursor() as cur:
+        return cur.execute(DB_QUERIES[data_type], [*scope_key, *params]).df()
+
+# Fetch data for an already parsed query; parsing (local or Gemini) happens before this, so the
+# script thread never waits on Gemini here
+def process_query(parsed_data, admin_role, use_db=False):
     with st.spinner("Processing..."):
         try:
-            parsed = chain.invoke({"query": query})
-            cleaned_response = re.search(r"\{.*\}", parsed, re.DOTALL)
-            if cleaned_response:
-                parsed = cleaned_response.group(0)
-            else:
-                parsed = parsed.strip().replace("undefined", "").replace("\n", "")
-            if not parsed or not isinstance(parsed, str):
-                return pd.DataFrame({"Error": ["No valid response from AI"]})
-            parsed_data = json.loads(parsed)
-
             data_type = parsed_data.get("data_type")
             query_grade = parsed_data.get("grade")
             query_class = parsed_data.get("class")
             query_region = parsed_data.get("region")
             time_period = parsed_data.get("time_period")
 
-            if not check_access(admin_role, query_grade, query_class, query_region):
-                return pd.DataFrame({"Message": ["Access denied: You don't have permission to view this data."]})
-
-            df = load_data()
-            scope = admin_scopes[admin_role]
-            filtered_df = df[
-                (df["grade"] == (int(query_grade) if query_grade is not None and query_grade.isdigit() else scope["grade"]))
-                & (df["class"] == (query_class if query_class is not None else scope["class"]))
-                & (df["region"] == (query_region if query_region is not None else scope["region"]))
-            ]
+            scope_key = resolve_scope(admin_role, query_grade, query_class, query_region)
+            if scope_key is None:
+                return pd.DataFrame({"Message": [ACCESS_DENIED_MESSAGE]})
 
+            role_frames = load_role_frames()[admin_role]
             if data_type == "homework":
-                result = filtered_df[filtered_df["homework_submitted"] == False][
-                    ["student_name"]
-                ]
+                if use_db:
+                    result = query_db("homework", scope_key)
+                else:
+                    result = role_frames["missing"]
                 return result if not result.empty else pd.DataFrame({"Message": ["All homework submitted"]})
-            elif data_type == "performance":
+
+            # One Timestamp per query; it compares against datetime64 columns without conversion
+            now = pd.Timestamp.now()
+            if data_type == "performance":
                 if time_period == "last week":
-                    last_week_start = datetime.now() - timedelta(days=7)
-                    last_week_end = datetime.now() - timedelta(days=1)
-                    result = filtered_df[
-                        (filtered_df["quiz_date"] >= last_week_start) & (filtered_df["quiz_date"] <= last_week_end)
-                    ][["student_name", "quiz_score"]]
+                    last_week_start = now - timedelta(days=7)
+                    last_week_end = now - timedelta(days=1)
+                    if use_db:
+                        result = query_db("performance", scope_key, last_week_start, last_week_end)
+                    else:
+                        result = slice_dates(role_frames["quiz_date"], "quiz_date", last_week_start, last_week_end)[
+                            ["student_name", "quiz_score"]
+                        ]
                     return result if not result.empty else pd.DataFrame({"Message": ["No performance data for last week"]})
             elif data_type == "quizzes":
                 if time_period == "next week":
-                    next_week_start = datetime.now() + timedelta(days=1)
-                    next_week_end = datetime.now() + timedelta(days=7)
-                    result = filtered_df[
-                        (filtered_df["upcoming_quiz"] >= next_week_start) & (filtered_df["upcoming_quiz"] <= next_week_end)
-                    ][["student_name", "upcoming_quiz"]]
+                    next_week_start = now + timedelta(days=1)
+                    next_week_end = now + timedelta(days=7)
+                    if use_db:
+                        result = query_db("quizzes", scope_key, next_week_start, next_week_end)
+                    else:
+                        result = slice_dates(
+                            role_frames["upcoming_quiz"], "upcoming_quiz", next_week_start, next_week_end
+                        )[["student_name", "upcoming_quiz"]]
                     return result if not result.empty else pd.DataFrame({"Message": ["No quizzes scheduled for next week"]})
             return pd.DataFrame({"Message": ["Unable to process query. Please use a valid query format."]})
 
-        except json.JSONDecodeError:
-            return pd.DataFrame({"Error": ["Invalid JSON response from AI"]})
         except Exception as e:
             return pd.DataFrame({"Error": [f"Error processing query: {str(e)}"]})
 
+# Populate the data and model caches in the background so the first query finds them warm.
+# cache_resource makes this run once per process rather than on every rerun. The caches it fills
+# are declared with show_spinner=False, since a spinner needs a script context the thread lacks.
+@st.cache_resource
+def start_cache_warmup():
+    def warm_caches():
+        load_role_frames()
+        get_model(gemini_api_key)
+        connect_to_db()
+
+    thread = threading.Thread(target=warm_caches, daemon=True)
+    thread.start()
+    return thread
+
+start_cache_warmup()
+
 # Streamlit UI with Enhanced Design
+df_all = load_data()[0]
+
 with st.sidebar:
     st.image("https://via.placeholder.com/150", use_container_width=True)
     st.title("Admin Dashboard")
@@ -214,25 +454,174 @@ with st.sidebar:
 st.markdown('<div class="stHeader">Dumroo Admin Panel</div>', unsafe_allow_html=True)
 st.write("Ask questions about student data in plain English")
 
-result_placeholder = st.empty()
-with st.form(key="query_form"):
-    col1, col2 = st.columns([3, 1])
-    with col1:
-        query = st.text_input("", placeholder="e.g., Which students haven't submitted their homework yet?")
-    with col2:
-        submit_button = st.form_submit_button("Submit")
-    if submit_button and query:
-        result = process_query(query, admin_role)
-        if "query_history" not in st.session_state:
-            st.session_state.query_history = []
-        st.session_state.query_history.append({"query": query, "result": result})
-        result_placeholder.dataframe(result, use_container_width=True, hide_index=True)
-
-if st.session_state.get("query_history"):
-    with st.expander("Query History"):
-        for i, entry in enumerate(reversed(st.session_state.query_history[-5:])):
-            with st.expander(f"Query {len(st.session_state.query_history) - i}: {entry['query']}"):
-                st.dataframe(entry["result"], use_container_width=True, hide_index=True)
+# Number of past queries kept in the session, stored as plain records rather than DataFrames
+HISTORY_SIZE = 5
+
+# Reserve a numbered history entry for a new query; its result is filled in when it finishes
+def add_to_history(query):
+    if "query_history" not in st.session_state:
+        st.session_state.query_history = deque(maxlen=HISTORY_SIZE)
+        st.session_state.query_count = 0
+    st.session_state.query_count += 1
+    entry = {"number": st.session_state.query_count, "query": query, "result": None}
+    st.session_state.query_history.append(entry)
+    return entry
+
+# Fill in a finished query's history entry and, for new queries, its slot in the results area
+def record_result(result, history_entry, latest_item=None):
+    history_entry["result"] = result.to_dict("records")
+    if latest_item is not None:
+        latest_item["result"] = result
+
+def make_pending(query, admin_role, use_db, history_entry, latest_item, future, index=None):
+    return {
+        "query": query,
+        "admin_role": admin_role,
+        "use_db": use_db,
+        "history_entry": history_entry,
+        "latest_item": latest_item,
+        "future": future,
+        # Position of this query in a batched parse, or None for a single parse
+        "index": index,
+    }
+
+# Answer what can be answered locally or from the parse cache and queue Gemini parses for the
+# rest; distinct queries are packed BATCH_SIZE at a time into one call. Nothing here waits on Gemini
+def submit_queries(queries, admin_role, use_db=False, history_entries=None):
+    if history_entries is None:
+        # Reserve every query's history entry and results slot up front, so results keep the
+        # order the queries were entered in rather than the order they finish
+        history_entries = [add_to_history(query) for query in queries]
+        latest_items = [{"query": query, "result": None} for query in queries]
+        st.session_state.latest_results = latest_items
+    else:
+        latest_items = [None] * len(queries)
+    to_parse = []
+    for query, history_entry, latest_item in zip(queries, history_entries, latest_items):
+        parsed_data = try_parse_locally(query)
+        if parsed_data is None and denied_locally(query, admin_role):
+            # Deny queries that explicitly name another scope before paying for a Gemini call
+            record_result(pd.DataFrame({"Message": [ACCESS_DENIED_MESSAGE]}), history_entry, latest_item)
+            continue
+        if parsed_data is None:
+            parsed_data = cached_parse(normalize_query(query))
+        if parsed_data is None:
+            to_parse.append((query, history_entry, latest_item))
+        else:
+            record_result(process_query(parsed_data, admin_role, use_db=use_db), history_entry, latest_item)
+
+    # Queries that normalize to the same key share one parse
+    keys = list(dict.fromkeys(normalize_query(query) for query, _, _ in to_parse))
+    futures = {}
+    if len(keys) == 1:
+        futures[keys[0]] = (get_executor().submit(parse_query, keys[0]), None)
+    else:
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = keys[start:start + BATCH_SIZE]
+            future = get_executor().submit(parse_batch, batch)
+            for index, key in enumerate(batch):
+                futures[key] = (future, index)
+    pending = st.session_state.setdefault("pending_queries", [])
+    for query, history_entry, latest_item in to_parse:
+        future, index = futures[normalize_query(query)]
+        pending.append(make_pending(query, admin_role, use_db, history_entry, latest_item, future, index))
+
+# Result for a pending query whose parse has finished, or None if it was requeued
+def collect_pending_query(pending):
+    if pending["index"] is not None:
+        try:
+            items = pending["future"].result()
+        except Exception:
+            items = []
+        parsed_data = items[pending["index"]] if pending["index"] < len(items) else None
+        if not isinstance(parsed_data, dict):
+            # The batch failed or skipped this query, so fall back to parsing it on its own
+            pending["future"] = get_executor().submit(parse_query, normalize_query(pending["query"]))
+            pending["index"] = None
+            return None
+    else:
+        try:
+            parsed_data = pending["future"].result()
+        except json.JSONDecodeError:
+            return pd.DataFrame({"Error": ["Invalid JSON response from AI"]})
+        except Exception as e:
+            return pd.DataFrame({"Error": [f"Error processing query: {str(e)}"]})
+    return process_query(parsed_data, pending["admin_role"], use_db=pending["use_db"])
+
+# Seconds between checks on pending Gemini parses
+POLL_INTERVAL = 0.5
+
+# Polls the pending Gemini parses on a timer; the rest of the page stays interactive meanwhile,
+# and each batch's results show up as soon as that batch finishes
+@st.fragment(run_every=POLL_INTERVAL)
+def pending_query_fragment():
+    still_pending = []
+    finished = False
+    for pending in st.session_state.get("pending_queries", []):
+        result = collect_pending_query(pending) if pending["future"].done() else None
+        if result is None:
+            still_pending.append(pending)
+        else:
+            record_result(result, pending["history_entry"], pending["latest_item"])
+            finished = True
+    st.session_state.pending_queries = still_pending
+    if finished:
+        st.rerun()
+    for pending in still_pending:
+        st.info(f"Processing: {pending['query']}")
+
+# Query form and history rerun as a fragment, so submitting does not re-execute the whole script
+@st.fragment
+def query_fragment(admin_role):
+    use_db = st.session_state.get("use_db", False)
+    batch_mode = st.toggle("Batch mode", help="Enter one query per line; they are parsed together in batches")
+    result_placeholder = st.empty()
+    with st.form(key="query_form"):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            if batch_mode:
+                query = st.text_area("", placeholder="One query per line")
+            else:
+                query = st.text_input("", placeholder="e.g., Which students haven't submitted their homework yet?")
+        with col2:
+            submit_button = st.form_submit_button("Submit")
+        if submit_button and query:
+            queries = [line.strip() for line in query.splitlines() if line.strip()] if batch_mode else [query]
+            submit_queries(queries, admin_role, use_db=use_db)
+            if st.session_state.pending_queries:
+                # Full rerun so pending_query_fragment starts polling
+                st.rerun()
+
+    latest_results = st.session_state.get("latest_results")
+    if latest_results:
+        with result_placeholder.container():
+            for item in latest_results:
+                if len(latest_results) > 1:
+                    st.write(item["query"])
+                if item["result"] is None:
+                    st.caption("Processing...")
+                else:
+                    st.dataframe(item["result"], use_container_width=True, hide_index=True)
+
+    if st.session_state.get("query_history"):
+        with st.expander("Query History"):
+            if st.button("Replay all"):
+                history = list(st.session_state.query_history)
+                submit_queries(
+                    [entry["query"] for entry in history], admin_role, use_db=use_db, history_entries=history
+                )
+                if st.session_state.pending_queries:
+                    st.rerun()
+            for entry in reversed(st.session_state.query_history):
+                with st.expander(f"Query {entry['number']}: {entry['query']}"):
+                    if entry["result"] is None:
+                        st.caption("Processing...")
+                    else:
+                        st.dataframe(pd.DataFrame(entry["result"]), use_container_width=True, hide_index=True)
+
+if st.session_state.get("pending_queries"):
+    pending_query_fragment()
+query_fragment(admin_role)
 
 st.subheader("Example Queries")
 st.write("- Which students haven't submitted their homework yet?")
@@ -240,12 +629,9 @@ st.write("- Show me performance data for Grade 8 from last week")
 st.write("- List all upcoming quizzes scheduled for next week")
 
 with st.expander("Dataset Preview"):
-    st.dataframe(load_data(), use_container_width=True)
-
-# Bonus: Modular database connection (placeholder for real DB)
-def connect_to_db():
-    return load_data()
+    st.dataframe(df_all, use_container_width=True)
 
-if st.checkbox("Use Database (Demo)"):
-    df = connect_to_db()
+if st.checkbox("Use Database (Demo)", key="use_db"):
+    with connect_to_db().cursor() as cur:
+        df = cur.execute("SELECT * FROM students").df()
     st.write("Data loaded from database (simulated):", df)
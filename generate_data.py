@@ -0,0 +1,22 @@
+import pandas as pd
+import os
+
+# Sample dataset behind students.feather; rerun this script after editing the rows
+data = {
+    "student_name": ["Alice Smith", "Bob Johnson", "Charlie Brown", "Diana Wilson",
+                    "Eve Davis", "Frank Miller", "Grace Lee", "Hank Taylor"],
+    "grade": [8, 8, 9, 9, 8, 9, 8, 9],
+    "class": ["A", "A", "B", "B", "A", "B", "A", "B"],
+    "region": ["North", "North", "South", "South", "North", "South", "North", "South"],
+    "homework_submitted": [True, False, True, False, False, True, True, False],
+    "quiz_score": [85, 0, 90, 0, 75, 88, 92, 0],
+    "quiz_date": ["2025-07-10", "2025-07-10", "2025-07-17", "2025-07-17",
+                  "2025-07-15", "2025-07-16", "2025-07-12", "2025-07-14"],
+    "upcoming_quiz": ["2025-07-20", "2025-07-20", "2025-07-21", "2025-07-21",
+                     "2025-07-22", "2025-07-23", "2025-07-24", "2025-07-25"],
+}
+
+df = pd.DataFrame(data)
+df["quiz_date"] = pd.to_datetime(df["quiz_date"])
+df["upcoming_quiz"] = pd.to_datetime(df["upcoming_quiz"])
+df.to_feather(os.path.join(os.path.dirname(os.path.abspath(__file__)), "students.feather"))